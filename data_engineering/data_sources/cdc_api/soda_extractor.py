@@ -8,6 +8,8 @@ The data is saved as a CSV file in the dbt seeds directory.
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
 from pathlib import Path
 import logging
@@ -23,33 +25,53 @@ class CDCSodaExtractor:
         self.base_url = f"https://data.cdc.gov/resource/{dataset_id}.json"
         self.indicator = "Synthetic opioids, excl. methadone (T40.4)"
 
-    def fetch_data(self) -> pd.DataFrame:
-        """Fetch data from the CDC API."""
-        logger.info(f"Fetching data from {self.base_url} for indicator: {self.indicator}")
-
-        # SODA API parameters
+        # SODA API parameters, fixed for the lifetime of the extractor
         # We want all states and all time periods for this indicator
-        params = {
+        self.params = {
             "indicator": self.indicator,
             "$limit": 50000  # Ensure we get all records
         }
 
+        # Retry transient failures with exponential backoff, honoring Retry-After on 429/503
+        retry = Retry(
+            total=5,
+            backoff_factor=1.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET",),
+            respect_retry_after_header=True
+        )
+        # Pooled, keep-alive connections so retries reuse the TLS session to data.cdc.gov
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16, pool_block=False, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({
+            'User-Agent': 'Fentanyl-Awareness-Pipeline/1.0',
+            'Accept': 'application/json',
+            'Connection': 'keep-alive'
+        })
+
+    def fetch_data(self) -> pd.DataFrame:
+        """Fetch data from the CDC API."""
+        logger.info("Fetching data from %s for indicator: %s", self.base_url, self.indicator)
+        logger.debug("Using request parameters: %r", self.params)
+
         try:
-            response = requests.get(self.base_url, params=params, timeout=60)
+            response = self.session.get(self.base_url, params=self.params, timeout=60)
             response.raise_for_status()
             data = response.json()
 
             df = pd.DataFrame(data)
-            logger.info(f"Successfully fetched {len(df)} records.")
+            logger.info("Successfully fetched %d records.", len(df))
             return df
 
         except Exception as e:
-            logger.error(f"Error fetching data from CDC API: {e}")
+            logger.error("Error fetching data from CDC API: %s", e)
             raise
 
     def save_to_csv(self, df: pd.DataFrame, output_path: Path):
         """Save the DataFrame to a CSV file."""
-        logger.info(f"Saving data to {output_path}")
+        logger.info("Saving data to %s", output_path)
         output_path.parent.mkdir(parents=True, exist_ok=True)
 
         df.to_csv(output_path, index=False)
@@ -13,11 +13,20 @@ Key Features:
 """
 
 import os
+import gzip
+import hashlib
+import json
+import re
+import time
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import numpy as np
 import pandas as pd
-import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Tuple
+from urllib.parse import urlencode
 import logging
 from pathlib import Path
 from dotenv import load_dotenv
@@ -36,14 +45,28 @@ CENSUS_API_BASE_URL = "https://api.census.gov/data"
 RATE_LIMITS = {
     "requests_per_day": 500,
     "requests_per_minute": 10,
-    "delay_between_requests": 0.2  # seconds
+    "max_concurrent_requests": 5
 }
 
+# Leading/trailing runs of whitespace or commas, or any inner comma, in Census NAME values
+STATE_NAME_CLEANUP = re.compile(r'^[\s,]+|[\s,]+$|,')
+
+# Response cache (released ACS years do not change, so they are cached indefinitely)
+CACHE_DIR = Path.home() / ".cache" / "census_extractor"
+RECENT_YEAR_CACHE_TTL = 24 * 60 * 60  # seconds, for the current and previous year
+
+def _is_acs_rows(data) -> bool:
+    """True for a Census JSON payload: a non-empty header row followed by rows of the same width"""
+    if not isinstance(data, list) or not data or not isinstance(data[0], list) or not data[0]:
+        return False
+    width = len(data[0])
+    return all(isinstance(row, list) and len(row) == width for row in data)
+
 class CensusExtractor:
     """Extract data from US Census API"""
 
-    def __init__(self, api_key: Optional[str] = None):
-        """Initialize Census extractor with API key"""
+    def __init__(self, api_key: Optional[str] = None, cache_dir: Optional[Path] = None):
+        """Initialize Census extractor with API key and response cache directory"""
         self.api_key = api_key or os.getenv('CENSUS_API_KEY')
         if not self.api_key:
             # We don't raise error here to allow the script to be imported/tested
@@ -51,7 +74,18 @@ class CensusExtractor:
             logger.warning("CENSUS_API_KEY not found in environment. API requests will likely fail.")
 
         self.base_url = CENSUS_API_BASE_URL
+        self.cache_dir = Path(cache_dir) if cache_dir else CACHE_DIR
+        # Pooled connections sized for the concurrent year fetches, with backoff on 429/5xx
+        retry = Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=['GET']
+        )
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20, max_retries=retry)
         self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
         self.session.headers.update({
             'User-Agent': 'Fentanyl-Awareness-Pipeline/1.0'
         })
@@ -63,79 +97,164 @@ class CensusExtractor:
             error_msg = error_msg.replace(self.api_key, "***REDACTED***")
         return error_msg
 
-    def get_state_population_estimates(self, years: List[int] = None) -> pd.DataFrame:
+    def _cache_path(self, url: str, params: dict) -> Path:
+        """Cache file for a request, keyed by URL and parameters (the API key is never part of the key)"""
+        key = f"{url}?{urlencode(sorted(params.items()))}"
+        return self.cache_dir / f"{hashlib.sha256(key.encode('utf-8')).hexdigest()}.json.gz"
+
+    def _cache_get(self, cache_path: Path, year: int) -> Optional[list]:
+        """Return cached JSON rows, or None on a miss, a stale recent-year entry or an unusable file"""
+        try:
+            if year >= datetime.now().year - 1:
+                if time.time() - cache_path.stat().st_mtime > RECENT_YEAR_CACHE_TTL:
+                    return None
+            with gzip.open(cache_path, 'rt', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, EOFError, ValueError):
+            # Missing, truncated or corrupt cache files are refetched
+            return None
+
+        # Anything other than a header row plus data rows is treated as a miss
+        return data if _is_acs_rows(data) else None
+
+    def _cache_set(self, cache_path: Path, data: list) -> None:
+        """Write JSON rows to the cache; failures are logged and otherwise ignored"""
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_suffix('.tmp')
+            with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.warning(f"Could not write Census cache file {cache_path}: {e}")
+
+    def _fetch_year(self, year: int, params: dict, request_params: dict, label: str) -> Optional[list]:
         """
-        Extract state-level population estimates from ACS
+        Fetch one year of state-level ACS 5-Year data
 
         Args:
-            years: List of years to extract (default: 2009 to current year)
+            year: Year to fetch
+            params: Query parameters without the API key (used as the cache key)
+            request_params: Query parameters actually sent, including the API key if set
+            label: Dataset name used in log messages
 
         Returns:
-            DataFrame with state population data
+            Raw JSON rows (header row first), or None if the year was not fetched
         """
-        if years is None:
-            current_year = datetime.now().year
-            # ACS 5-year estimates started in 2009
-            years = list(range(2009, current_year + 1))
+        try:
+            # ACS 5-Year Estimates endpoint
+            url = f"{self.base_url}/{year}/acs/acs5"
 
-        logger.info(f"Extracting state population estimates for years: {years}")
+            cache_path = self._cache_path(url, params)
+            cached = self._cache_get(cache_path, year)
+            if cached is not None:
+                logger.info(f"Using cached {label} for year {year}")
+                return cached
+
+            logger.info(f"Fetching {label} for year {year}...")
+            response = self.session.get(url, params=request_params, timeout=30)
+
+            if response.status_code == 404:
+                logger.warning(f"{label.capitalize()} for year {year} not available yet (404). Skipping.")
+                return None
 
-        all_data = []
+            response.raise_for_status()
+
+            # Check if the response is actually JSON
+            if 'application/json' not in response.headers.get('Content-Type', ''):
+                logger.error(f"Error fetching {label} for year {year}: Expected JSON but received {response.headers.get('Content-Type')}. "
+                             f"This often indicates a missing API key or an invalid endpoint.")
+                return None
 
-        for year in years:
             try:
-                # ACS 5-Year Estimates endpoint
-                url = f"{self.base_url}/{year}/acs/acs5"
+                data = response.json()
+            except Exception as e:
+                logger.error(f"Error parsing {label} JSON for year {year}: {self._sanitize_error(e)}")
+                return None
 
-                params = {
-                    'get': 'NAME,B01001_001E',  # B01001_001E is total population
-                    'for': 'state:*',
-                    'key': self.api_key
-                } if self.api_key else {
-                    'get': 'NAME,B01001_001E',
-                    'for': 'state:*'
-                }
+            # Validate before caching so only payloads that can be used are stored
+            if not _is_acs_rows(data):
+                logger.error(f"Error fetching {label} for year {year}: Unexpected JSON payload "
+                             f"(expected a header row followed by data rows)")
+                return None
 
-                logger.info(f"Fetching data for year {year}...")
-                response = self.session.get(url, params=params, timeout=30)
+            self._cache_set(cache_path, data)
+            return data
 
-                if response.status_code == 404:
-                    logger.warning(f"Data for year {year} not available yet (404). Skipping.")
-                    continue
+        except Exception as e:
+            logger.error(f"Error fetching {label} for year {year}: {self._sanitize_error(e)}")
+            return None
 
-                response.raise_for_status()
+    def _fetch_all_years(self, years: List[int], variables: str, label: str) -> List[Tuple[int, list]]:
+        """
+        Fetch several years concurrently over the shared session
 
-                # Check if the response is actually JSON
-                if 'application/json' not in response.headers.get('Content-Type', ''):
-                    logger.error(f"Error fetching data for year {year}: Expected JSON but received {response.headers.get('Content-Type')}. "
-                                 f"This often indicates a missing API key or an invalid endpoint.")
-                    continue
+        Returns:
+            (year, rows) pairs in the order of `years`, skipping years that failed
+        """
+        # The query is the same for every year, so build it once
+        params = {
+            'get': variables,
+            'for': 'state:*'
+        }
+        request_params = {**params, 'key': self.api_key} if self.api_key else params
+
+        with ThreadPoolExecutor(max_workers=RATE_LIMITS["max_concurrent_requests"]) as executor:
+            results = executor.map(lambda year: self._fetch_year(year, params, request_params, label), years)
+            return [(year, data) for year, data in zip(years, results) if data is not None]
+
+    def _fetch_frame(self, years: List[int], variables: str, label: str, extracted_at: pd.Timestamp) -> pd.DataFrame:
+        """
+        Fetch several years and combine them into one uncleaned DataFrame
 
-                try:
-                    data = response.json()
-                except Exception as e:
-                    logger.error(f"Error parsing JSON for year {year}: {self._sanitize_error(e)}")
-                    continue
+        Returns:
+            Raw ACS columns as strings plus 'year' and 'extracted_at'
+        """
+        header = None
+        all_rows = []
+        row_years = []
+
+        for year, data in self._fetch_all_years(years, variables, label):
+            if header is None:
+                header = data[0]
+            elif data[0] != header:
+                logger.error(f"Error fetching {label} for year {year}: Columns {data[0]} do not match {header}. Skipping.")
+                continue
+            all_rows.extend(data[1:])
+            row_years.extend([year] * (len(data) - 1))
 
-                # Convert to DataFrame
-                df = pd.DataFrame(data[1:], columns=data[0])
-                df['year'] = year
-                df['extracted_at'] = datetime.now()
+        if header is None:
+            raise Exception(f"No {label} extracted successfully")
 
-                all_data.append(df)
+        # Build a single DataFrame across all years
+        # Census returns every value as a string, so skip dtype inference
+        combined_df = pd.DataFrame(all_rows, columns=header, dtype=str)
+        combined_df['year'] = row_years
+        combined_df['extracted_at'] = extracted_at
+        return combined_df
 
-                # Rate limiting
-                time.sleep(RATE_LIMITS["delay_between_requests"])
+    def get_state_population_estimates(self, years: List[int] = None) -> pd.DataFrame:
+        """
+        Extract state-level population estimates from ACS
 
-            except Exception as e:
-                logger.error(f"Error fetching data for year {year}: {self._sanitize_error(e)}")
-                continue
+        Args:
+            years: List of years to extract (default: 2009 to current year)
+
+        Returns:
+            DataFrame with state population data
+        """
+        # One timestamp for the whole extraction, broadcast into a datetime64 column
+        extracted_at = pd.Timestamp.now()
+
+        if years is None:
+            current_year = extracted_at.year
+            # ACS 5-year estimates started in 2009
+            years = list(range(2009, current_year + 1))
 
-        if not all_data:
-            raise Exception("No population data extracted successfully")
+        logger.info(f"Extracting state population estimates for years: {years}")
 
-        # Combine all years
-        combined_df = pd.concat(all_data, ignore_index=True)
+        # B01001_001E is total population
+        combined_df = self._fetch_frame(years, 'NAME,B01001_001E', 'population data', extracted_at)
 
         # Clean and standardize data
         combined_df = self._clean_population_data(combined_df)
@@ -153,68 +272,17 @@ class CensusExtractor:
         Returns:
             DataFrame with state economic data
         """
+        # One timestamp for the whole extraction, broadcast into a datetime64 column
+        extracted_at = pd.Timestamp.now()
+
         if years is None:
-            current_year = datetime.now().year
+            current_year = extracted_at.year
             years = list(range(2009, current_year + 1))
 
         logger.info(f"Extracting state economic data for years: {years}")
 
-        all_data = []
-
-        for year in years:
-            try:
-                # ACS 5-Year Estimates endpoint
-                url = f"{self.base_url}/{year}/acs/acs5"
-
-                params = {
-                    'get': 'B19013_001E,B19301_001E,B23025_002E,B23025_003E,B23025_004E,B23025_005E,NAME',
-                    'for': 'state:*',
-                    'key': self.api_key
-                } if self.api_key else {
-                    'get': 'B19013_001E,B19301_001E,B23025_002E,B23025_003E,B23025_004E,B23025_005E,NAME',
-                    'for': 'state:*'
-                }
-
-                logger.info(f"Fetching economic data for year {year}...")
-                response = self.session.get(url, params=params, timeout=30)
-
-                if response.status_code == 404:
-                    logger.warning(f"Economic data for year {year} not available yet (404). Skipping.")
-                    continue
-
-                response.raise_for_status()
-
-                # Check if the response is actually JSON
-                if 'application/json' not in response.headers.get('Content-Type', ''):
-                    logger.error(f"Error fetching economic data for year {year}: Expected JSON but received {response.headers.get('Content-Type')}. "
-                                 f"This often indicates a missing API key or an invalid endpoint.")
-                    continue
-
-                try:
-                    data = response.json()
-                except Exception as e:
-                    logger.error(f"Error parsing economic JSON for year {year}: {self._sanitize_error(e)}")
-                    continue
-
-                # Convert to DataFrame
-                df = pd.DataFrame(data[1:], columns=data[0])
-                df['year'] = year
-                df['extracted_at'] = datetime.now()
-
-                all_data.append(df)
-
-                # Rate limiting
-                time.sleep(RATE_LIMITS["delay_between_requests"])
-
-            except Exception as e:
-                logger.error(f"Error fetching economic data for year {year}: {self._sanitize_error(e)}")
-                continue
-
-        if not all_data:
-            raise Exception("No economic data extracted successfully")
-
-        # Combine all years
-        combined_df = pd.concat(all_data, ignore_index=True)
+        economic_variables = 'B19013_001E,B19301_001E,B23025_002E,B23025_003E,B23025_004E,B23025_005E,NAME'
+        combined_df = self._fetch_frame(years, economic_variables, 'economic data', extracted_at)
 
         # Clean and standardize data
         combined_df = self._clean_economic_data(combined_df)
@@ -226,8 +294,8 @@ class CensusExtractor:
         """Clean and standardize population data from ACS"""
 
         # Convert numeric columns
-        df['B01001_001E'] = pd.to_numeric(df['B01001_001E'], errors='coerce')
-        df['state'] = pd.to_numeric(df['state'], errors='coerce')
+        numeric_columns = ['B01001_001E', 'state']
+        df[numeric_columns] = df[numeric_columns].apply(pd.to_numeric, errors='coerce')
 
         # Rename columns for consistency
         df = df.rename(columns={
@@ -236,8 +304,8 @@ class CensusExtractor:
             'NAME': 'state_name'
         })
 
-        # Clean state names (remove extra text)
-        df['state_name'] = df['state_name'].str.replace(',', '').str.strip()
+        # Clean state names (drop commas and surrounding whitespace in one pass)
+        df['state_name'] = df['state_name'].str.replace(STATE_NAME_CLEANUP, '', regex=True)
 
         # Add data description
         df['date_description'] = 'ACS 5-Year Estimate'
@@ -248,7 +316,8 @@ class CensusExtractor:
             'date_description', 'extracted_at'
         ]
 
-        return df[final_columns].dropna()
+        # Drop incomplete rows first so state codes can be stored as integers
+        return df[final_columns].dropna().astype({'state_code': 'int32'})
 
     def _clean_economic_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """Clean and standardize economic data"""
@@ -259,8 +328,8 @@ class CensusExtractor:
 
         df[numeric_columns] = df[numeric_columns].apply(pd.to_numeric, errors='coerce')
 
-        # Convert state code to numeric
-        df['state'] = pd.to_numeric(df['state'], errors='coerce')
+        # Convert state code in one coerced pass (unparseable codes become NaN and are dropped below)
+        df['state_code'] = pd.to_numeric(df['state'], errors='coerce')
 
         # Rename columns to meaningful names
         df = df.rename(columns={
@@ -273,12 +342,13 @@ class CensusExtractor:
             'NAME': 'state_name'
         })
 
-        # Calculate unemployment rate (handle division by zero and NaN)
-        df['unemployment_rate'] = (df['unemployed'] / df['labor_force_civilian'] * 100).round(2)
-        df['unemployment_rate'] = df['unemployment_rate'].fillna(0)
-
-        # Use the state field directly (already converted to numeric above)
-        df['state_code'] = df['state'].astype(int)
+        # Calculate unemployment rate (0 where the civilian labor force is zero or missing)
+        labor_force = df['labor_force_civilian'].to_numpy()
+        has_labor_force = labor_force > 0
+        safe_labor_force = np.where(has_labor_force, labor_force, 1)
+        df['unemployment_rate'] = np.where(
+            has_labor_force, np.round(df['unemployed'].to_numpy() / safe_labor_force * 100, 2), 0.0
+        )
 
         # Select final columns
         final_columns = [
@@ -287,7 +357,8 @@ class CensusExtractor:
             'employed', 'unemployed', 'extracted_at'
         ]
 
-        return df[final_columns].dropna()
+        # Drop incomplete rows first so state codes can be stored as integers
+        return df[final_columns].dropna().astype({'state_code': 'int32'})
 
 def test_census_api():
     """Test Census API connection and data extraction"""
@@ -323,7 +394,7 @@ def main():
         # Extract economic data
         economic_df = extractor.get_state_economic_data()
 
-        # Save to CSV files (overwrite if they exist)
+        # Save to CSV files
         # Using Path(__file__) for robust resolution
         script_path = Path(__file__).resolve()
         output_dir = script_path.parent.parent.parent / "data_build_tool" / "dbt" / "seeds"
@@ -332,12 +403,7 @@ def main():
         population_file = output_dir / "census_state_population.csv"
         economic_file = output_dir / "census_state_economic.csv"
 
-        # Remove existing files if they exist to ensure clean overwrite
-        for file_path in [population_file, economic_file]:
-            if file_path.exists():
-                file_path.unlink()
-                logger.info(f"Removed existing file: {file_path}")
-
+        # to_csv truncates existing files, so previous seeds are overwritten in place
         population_df.to_csv(population_file, index=False)
         economic_df.to_csv(economic_file, index=False)
 
@@ -5,28 +5,90 @@ Setup script for Fentanyl Awareness Data Pipeline
 This script helps users set up the project environment and run initial tests.
 """
 
+import argparse
+import hashlib
+import importlib
 import os
+import shutil
 import sys
 import subprocess
+import traceback
 from pathlib import Path
 
-def run_command(cmd_list, description):
+# Paths below are resolved against this script so setup works from any working directory
+SCRIPT_DIR = Path(__file__).resolve().parent
+
+# Extraction modules smoke-tested by `python setup.py test`
+PIPELINE_MODULES = (
+    "data_sources.cdc_api.soda_extractor",
+    "data_sources.census_acs.census_extractor",
+)
+
+# Leaf directories created by setup; parents such as data_build_tool/dbt/models are implied
+PROJECT_DIRECTORIES = tuple(SCRIPT_DIR / directory for directory in (
+    "data_build_tool/dbt/seeds",
+    "data_build_tool/dbt/models/staging",
+    "data_build_tool/dbt/models/marts",
+    "data",
+    "logs",
+))
+
+SETUP_COMPLETE_MESSAGE = """
+🎉 Setup completed successfully!
+
+📋 Next steps:
+1. Copy ../.env.example to ../.env and set CENSUS_API_KEY
+2. Run: python data_sources/cdc_api/soda_extractor.py
+3. Run: python data_sources/census_acs/census_extractor.py
+4. Run: cd data_build_tool && dbt seed && dbt run"""
+
+REQUIREMENTS_FILE = SCRIPT_DIR / "requirements.txt"
+# Hash of the last successfully installed requirements.txt and target environment
+REQUIREMENTS_HASH_FILE = SCRIPT_DIR / ".setup_cache" / "requirements.sha256"
+
+def run_command(cmd_list, description, cwd=None):
     """Run a command and handle errors.
 
     Args:
         cmd_list: List of command and arguments (e.g., ['pip', 'install', 'package'])
         description: Human-readable description of what this command does
+        cwd: Directory to run the command in (default: current directory)
     """
     print(f"🔄 {description}...")
     try:
         # Use explicit command list with shell=False to prevent injection
-        result = subprocess.run(cmd_list, check=True, capture_output=True, text=True)
+        # stdout streams to the terminal; stderr is kept for the error report
+        subprocess.run(cmd_list, check=True, stdout=None, stderr=subprocess.PIPE, text=True, cwd=cwd)
         print(f"✅ {description} completed successfully")
         return True
     except subprocess.CalledProcessError as e:
         print(f"❌ {description} failed: {e}")
         print(f"Error output: {e.stderr}")
         return False
+    except FileNotFoundError as e:
+        # Raised for a missing executable or a missing working directory; e.filename names which
+        print(f"❌ {description} failed: {e.filename or cmd_list[0]} not found")
+        return False
+
+def _requirements_hash():
+    """Return a SHA-256 hex digest of requirements.txt and the interpreter it installs into."""
+    digest = hashlib.sha256(REQUIREMENTS_FILE.read_bytes())
+    # A recreated venv or a different interpreter must not reuse another environment's stamp
+    for environment_marker in (sys.prefix, sys.executable):
+        digest.update(b"\0" + environment_marker.encode("utf-8"))
+    return digest.hexdigest()
+
+def _requirements_installed(requirements_hash):
+    """Check whether this exact requirements.txt was already installed."""
+    try:
+        return REQUIREMENTS_HASH_FILE.read_text().strip() == requirements_hash
+    except FileNotFoundError:
+        return False
+
+def _record_requirements_installed(requirements_hash):
+    """Remember that requirements.txt was installed into the current environment."""
+    REQUIREMENTS_HASH_FILE.parent.mkdir(parents=True, exist_ok=True)
+    REQUIREMENTS_HASH_FILE.write_text(requirements_hash)
 
 def check_python_version():
     """Check if Python version is compatible."""
@@ -45,32 +107,35 @@ def setup_environment():
     if not check_python_version():
         return False
 
-    # Install dependencies
-    if not run_command(['pip', 'install', '-r', 'requirements.txt'], "Installing Python dependencies"):
+    # Install dependencies (skipped when requirements.txt is unchanged since the last install)
+    try:
+        requirements_hash = _requirements_hash()
+    except FileNotFoundError:
+        print(f"❌ Installing Python dependencies failed: {REQUIREMENTS_FILE} not found")
         return False
 
-    # Create necessary directories
-    directories = [
-        "dbt/seeds",
-        "dbt/models/staging",
-        "dbt/models/marts",
-        "data",
-        "logs"
-    ]
-
-    for directory in directories:
-        Path(directory).mkdir(parents=True, exist_ok=True)
+    if _requirements_installed(requirements_hash):
+        print("✅ Python dependencies up to date (requirements.txt unchanged for this environment)")
+    else:
+        # Install with this interpreter's pip so packages land in the environment the stamp names
+        if not run_command([sys.executable, '-m', 'pip', 'install', '-r', str(REQUIREMENTS_FILE)],
+                           "Installing Python dependencies"):
+            return False
+        _record_requirements_installed(requirements_hash)
+
+    # Create necessary directories (leaves only; makedirs creates shared parents once)
+    for directory in PROJECT_DIRECTORIES:
+        os.makedirs(directory, exist_ok=True)
         print(f"✅ Created directory: {directory}")
 
-    # Check if dbt is working
-    if not run_command(['dbt', '--version'], "Checking dbt installation"):
+    # Check that dbt is installed
+    dbt_path = shutil.which('dbt')
+    if dbt_path is None:
+        print("❌ dbt not found on PATH")
         return False
+    print(f"✅ Found dbt at {dbt_path}")
 
-    print("\n🎉 Setup completed successfully!")
-    print("\n📋 Next steps:")
-    print("1. Copy .env.example to .env and configure your settings")
-    print("2. Run: python extract_data.py")
-    print("3. Run: cd dbt && dbt run")
+    print(SETUP_COMPLETE_MESSAGE)
 
     return True
 
@@ -78,24 +143,37 @@ def test_pipeline():
     """Test the pipeline components."""
     print("\n🧪 Testing pipeline components...")
 
-    # Test data extraction (dry run)
-    if not run_command(['python', '-c', 'from extract_data import CDCWonderExtractor; print("Extraction module OK")'],
-                      "Testing extraction module"):
-        return False
+    # Test data extraction modules import cleanly (in-process, no extra interpreter)
+    for module_name in PIPELINE_MODULES:
+        try:
+            importlib.import_module(module_name)
+            print(f"✅ {module_name} OK")
+        except Exception:
+            print(f"❌ Failed to import {module_name}")
+            traceback.print_exc()
+            return False
 
     # Test dbt configuration
-    if not run_command(['dbt', 'debug'], "Testing dbt configuration"):
+    # dbt must run from the directory containing dbt_project.yml
+    if not run_command(['dbt', 'debug'], "Testing dbt configuration", cwd=SCRIPT_DIR / "data_build_tool"):
         return False
 
     print("✅ All tests passed!")
     return True
 
-def main():
+COMMANDS = {
+    "setup": setup_environment,
+    "test": test_pipeline,
+}
+
+def main(argv=None):
     """Main setup function."""
-    if len(sys.argv) > 1 and sys.argv[1] == "test":
-        return test_pipeline()
-    else:
-        return setup_environment()
+    parser = argparse.ArgumentParser(description="Set up and test the Fentanyl Awareness data pipeline.")
+    parser.add_argument("command", nargs="?", choices=COMMANDS, default="setup",
+                        help="'setup' installs dependencies and creates directories (default); "
+                             "'test' smoke-tests the pipeline components")
+    args = parser.parse_args(argv)
+    return COMMANDS[args.command]()
 
 if __name__ == "__main__":
     success = main()
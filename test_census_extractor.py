@@ -1,3 +1,5 @@
+import gzip
+import json
 import pandas as pd
 from data_engineering.data_sources.census_acs.census_extractor import CensusExtractor
 
@@ -24,8 +26,143 @@ def test_clean_economic_data():
     assert len(cleaned_df) == 2  # The row with 'invalid' should be dropped due to dropna()
     assert list(cleaned_df['state_code']) == [1, 2]
     assert list(cleaned_df['median_household_income']) == [1000.0, 2000.0]
+    assert list(cleaned_df['unemployment_rate']) == [11.11, 11.11]
 
     print("Test passed successfully!")
 
+def test_clean_population_data():
+    extractor = CensusExtractor()
+    df = pd.DataFrame({
+        'B01001_001E': ['100', '200', 'invalid', '400'],
+        'state': ['01', '72', '03', 'XX'],
+        'NAME': [' State 1 ', 'Puerto Rico,', 'State 3', 'State 4'],
+        'year': [2021, 2021, 2021, 2021],
+        'extracted_at': ['2023-01-01', '2023-01-01', '2023-01-01', '2023-01-01']
+    })
+
+    cleaned_df = extractor._clean_population_data(df)
+
+    assert list(cleaned_df['state_name']) == ['State 1', 'Puerto Rico']
+    assert list(cleaned_df['population']) == [100, 200]
+    # Rows with unparseable state codes are dropped instead of breaking the integer cast
+    assert list(cleaned_df['state_code']) == [1, 72]
+    assert pd.api.types.is_integer_dtype(cleaned_df['state_code'])
+
+def test_unemployment_rate_is_zero_without_labor_force():
+    extractor = CensusExtractor()
+    df = pd.DataFrame({
+        'B19013_001E': ['1000', '2000'],
+        'B19301_001E': ['3000', '4000'],
+        'B23025_002E': ['100', '0'],
+        'B23025_003E': ['80', '0'],
+        'B23025_004E': ['60', '0'],
+        'B23025_005E': ['20', '5'],
+        'state': ['01', '02'],
+        'NAME': ['State 1', 'State 2'],
+        'year': [2021, 2021],
+        'extracted_at': ['2023-01-01', '2023-01-01']
+    })
+
+    cleaned_df = extractor._clean_economic_data(df)
+
+    assert list(cleaned_df['unemployment_rate']) == [25.0, 0.0]
+
+class FakeResponse:
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self.headers = {'Content-Type': 'application/json;charset=utf-8'}
+        self._payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._payload
+
+class FakeSession:
+    """Serves canned ACS responses keyed by the year in the request URL."""
+
+    def __init__(self, responses):
+        self.responses = responses
+
+    def get(self, url, params=None, timeout=None):
+        year = int(url.split('/')[-3])
+        return self.responses[year]
+
+def test_get_state_population_estimates_skips_missing_years(tmp_path):
+    extractor = CensusExtractor(cache_dir=tmp_path)
+    extractor.session = FakeSession({
+        2020: FakeResponse(200, [['NAME', 'B01001_001E', 'state'], ['State 1', '100', '01']]),
+        2021: FakeResponse(404),
+        2022: FakeResponse(200, [['NAME', 'B01001_001E', 'state'], ['State 1', '110', '01'], ['State 2', '220', '02']]),
+    })
+
+    df = extractor.get_state_population_estimates(years=[2020, 2021, 2022])
+
+    # Years come back in request order and the unavailable year is skipped
+    assert list(df['year']) == [2020, 2022, 2022]
+    assert list(df['population']) == [100, 110, 220]
+    assert list(df['state_code']) == [1, 1, 2]
+
+def test_malformed_year_does_not_stop_extraction(tmp_path):
+    rows = [['NAME', 'B01001_001E', 'state'], ['State 1', '100', '01']]
+    for case, bad_payload in enumerate([[], {'error': 'x'}, [['NAME', 'B01001_001E', 'state'], ['short']]]):
+        extractor = CensusExtractor(cache_dir=tmp_path / f"case{case}")
+        extractor.session = FakeSession({
+            2015: FakeResponse(200, bad_payload),
+            2016: FakeResponse(200, rows),
+        })
+
+        df = extractor.get_state_population_estimates(years=[2015, 2016])
+
+        assert list(df['year']) == [2016]
+        assert list(df['population']) == [100]
+
+def test_cached_years_skip_the_network(tmp_path):
+    rows = [['NAME', 'B01001_001E', 'state'], ['State 1', '100', '01']]
+    extractor = CensusExtractor(cache_dir=tmp_path)
+    extractor.session = FakeSession({2015: FakeResponse(200, rows)})
+    extractor.get_state_population_estimates(years=[2015])
+
+    # A second extractor with no canned responses must be served from the cache
+    cached_extractor = CensusExtractor(cache_dir=tmp_path)
+    cached_extractor.session = FakeSession({})
+    df = cached_extractor.get_state_population_estimates(years=[2015])
+
+    assert list(df['population']) == [100]
+
+def test_unusable_cache_files_are_refetched(tmp_path):
+    rows = [['NAME', 'B01001_001E', 'state'], ['State 1', '100', '01']]
+    extractor = CensusExtractor(cache_dir=tmp_path)
+    extractor.session = FakeSession({2015: FakeResponse(200, rows)})
+    extractor.get_state_population_estimates(years=[2015])
+    cache_path = next(tmp_path.glob('*.json.gz'))
+
+    # Truncated gzip stream, then a payload that parses but holds no rows
+    cache_path.write_bytes(cache_path.read_bytes()[:10])
+    df = extractor.get_state_population_estimates(years=[2015])
+    assert list(df['population']) == [100]
+
+    with gzip.open(cache_path, 'wt', encoding='utf-8') as f:
+        json.dump([], f)
+    df = extractor.get_state_population_estimates(years=[2015])
+    assert list(df['population']) == [100]
+
+def test_malformed_payloads_are_not_cached(tmp_path):
+    rows = [['NAME', 'B01001_001E', 'state'], ['State 1', '100', '01']]
+    for case, bad_payload in enumerate([[], {'error': 'x'}]):
+        cache_dir = tmp_path / f"case{case}"
+        extractor = CensusExtractor(cache_dir=cache_dir)
+        extractor.session = FakeSession({
+            2015: FakeResponse(200, bad_payload),
+            2016: FakeResponse(200, rows),
+        })
+
+        df = extractor.get_state_population_estimates(years=[2015, 2016])
+
+        assert list(df['year']) == [2016]
+        # Only the usable 2016 payload is written to the cache
+        assert len(list(cache_dir.glob('*.json.gz'))) == 1
+
 if __name__ == "__main__":
     test_clean_economic_data()
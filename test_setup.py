@@ -0,0 +1,31 @@
+import sys
+from data_engineering import setup
+
+def test_new_environment_forces_reinstall(tmp_path, monkeypatch):
+    requirements_file = tmp_path / "requirements.txt"
+    requirements_file.write_text("requests>=2.31.0\n")
+    monkeypatch.setattr(setup, "REQUIREMENTS_FILE", requirements_file)
+    monkeypatch.setattr(setup, "REQUIREMENTS_HASH_FILE", tmp_path / ".setup_cache" / "requirements.sha256")
+
+    setup._record_requirements_installed(setup._requirements_hash())
+    assert setup._requirements_installed(setup._requirements_hash())
+
+    # Same requirements.txt, different venv: the install must not be skipped
+    monkeypatch.setattr(sys, "prefix", str(tmp_path / "other-venv"))
+    assert not setup._requirements_installed(setup._requirements_hash())
+
+def test_missing_requirements_file_fails_cleanly(tmp_path, monkeypatch):
+    monkeypatch.setattr(setup, "REQUIREMENTS_FILE", tmp_path / "requirements.txt")
+
+    assert setup.setup_environment() is False
+
+def test_run_command_reports_missing_working_directory(tmp_path, capsys):
+    missing_dir = tmp_path / "data_build_tool"
+
+    assert setup.run_command([sys.executable, "-c", "pass"], "Testing", cwd=missing_dir) is False
+    assert f"{missing_dir} not found" in capsys.readouterr().out
+
+def test_project_directories_resolve_against_setup_script():
+    for directory in setup.PROJECT_DIRECTORIES:
+        assert directory.is_absolute()
+        assert directory.is_relative_to(setup.SCRIPT_DIR)